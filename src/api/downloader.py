@@ -86,11 +86,9 @@ class Downloader:
                 return True
 
             finally:
-                if temp_path.exists():
-                    temp_path.unlink()
-                if zip_path.exists():
-                    zip_path.unlink()
+                temp_path.unlink(missing_ok=True)
+                zip_path.unlink(missing_ok=True)
 
         except Exception as e:
-            logger.error(f"Download error: {str(e)}")
+            logger.error("Download error: %s", e)
             return False
@@ -2,6 +2,7 @@
 import logging
 import time
 import requests
+import queue
 import zipfile
 import threading
 import multiprocessing
@@ -197,7 +198,6 @@ class S5PFetcher:
             return
 
         # 使用 Queue 來管理下載任務
-        import queue
         task_queue = queue.Queue()
         for product in products:
             task_queue.put(product)
@@ -301,7 +301,7 @@ class S5PFetcher:
                                         headers = {'Authorization': f'Bearer {token}'}
 
                             except Exception as e:
-                                logger.error(f"Download attempt {attempt + 1} failed for {file_name}: {str(e)}")
+                                logger.error("Download attempt %d failed for %s: %s", attempt + 1, file_name, e)
                                 if attempt < 2:
                                     time.sleep(5)
                                 continue
@@ -313,8 +313,7 @@ class S5PFetcher:
 
                             else:
                                 self.download_stats['failed'] += 1
-                                if output_path.exists():
-                                    output_path.unlink()
+                                output_path.unlink(missing_ok=True)
 
                         success = True
                         with stats_lock:
@@ -323,14 +322,14 @@ class S5PFetcher:
                             completed_files.value += 1
 
                     except Exception as e:
-                        logger.error(f"Error downloading {file_name}: {str(e)}")
+                        logger.error("Error downloading %s: %s", file_name, e)
                         with stats_lock:
                             self.download_stats['failed'] += 1
                         with completed_files.get_lock():
                             completed_files.value += 1
 
-                        if 'output_path' in locals() and output_path.exists():
-                            output_path.unlink()
+                        if 'output_path' in locals():
+                            output_path.unlink(missing_ok=True)
                     finally:
                         with progress_lock:
                             progress.update(task_id, visible=False, refresh=True)
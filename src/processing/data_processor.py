@@ -1,23 +1,117 @@
 """src/processing/no2_processor.py"""
+import os
+import re
+import fnmatch
+import functools
 import logging
+import multiprocessing
 import numpy as np
 import xarray as xr
+import matplotlib
 from datetime import datetime
+from pathlib import Path
 from dateutil.relativedelta import relativedelta
 
 from src.processing.interpolators import DataInterpolator
 from src.processing.taiwan_frame import TaiwanFrame
 from src.config.settings import RAW_DATA_DIR, PROCESSED_DATA_DIR, FIGURE_DIR, FIGURE_BOUNDARY
-from src.visualization.plot_nc import plot_global_var
+from src.visualization.plot_nc import plot_global_var, create_basemap
 from src.config.catalog import ClassInput, TypeInput, PRODUCT_CONFIGS
 from src.config.richer import DisplayManager
 
 
 logger = logging.getLogger(__name__)
 
+# S5P 檔名中的觀測開始時間，例如 ..._20240314T031823_...
+_DATE_RE = re.compile(r'_(\d{8})T\d{6}_')
+
+
+@functools.lru_cache(maxsize=8192)
+def _file_date(file_name: str) -> str | None:
+    """從檔名取得觀測日期字串 (YYYYMMDD)，找不到時回傳 None
+
+    固定寬度的日期字串可直接以字串比較與排序，不必建立 datetime；
+    原始檔與處理後檔案同名，每個檔名在篩選原始檔與繪圖兩個階段都會被解析，故快取結果
+    """
+    match = _DATE_RE.search(file_name)
+    return match.group(1) if match else None
+
+
+def _dated_files(directory: Path, pattern: str, start: datetime, end: datetime) -> list[Path]:
+    """列出日期在 [start, end] 內的檔案，依觀測日期排序"""
+    start_key, end_key = start.strftime('%Y%m%d'), end.strftime('%Y%m%d')
+    dated = []
+    for file_path in _iter_nc_files(directory, pattern):
+        file_date = _file_date(file_path.name)
+        if file_date is not None and start_key <= file_date <= end_key:
+            dated.append((file_date, file_path))
+    dated.sort()
+    return [file_path for _, file_path in dated]
+
+
+def _load_plot_data(file_path: Path, dataset_name: str) -> xr.Dataset:
+    """讀取繪圖所需的變數與第一個時間切片並載入記憶體"""
+    # 指定 engine 省去逐一猜測後端；只載入繪圖用的變數與第一個時間切片
+    with xr.open_dataset(file_path, engine='netcdf4', cache=False) as ds:
+        data = ds[[dataset_name]].isel(time=slice(0, 1)).load()
+    data.encoding['source'] = str(file_path)
+    return data
+
+
+def _init_worker():
+    """子行程初始化：批次輸出圖檔，改用不需要互動式視窗的 Agg 後端
+
+    只在子行程中切換，匯入本模組的互動式工作階段仍保留原本的後端
+    """
+    matplotlib.use('Agg')
+
+
+@functools.lru_cache(maxsize=1)
+def _worker_basemap():
+    """子行程共用的台灣底圖，每個行程只建立一次，之後的檔案只更新數據圖層"""
+    return create_basemap(map_scale='Taiwan', show_stations=True)
+
+
+def _plot_file(task):
+    """讀取並繪製單一處理後檔案（於子行程中執行）
+
+    Returns:
+        (檔案路徑, 是否已繪製, 錯誤訊息)，成功時錯誤訊息為 None；
+        有效像素過少而略過的檔案為 (檔案路徑, False, None)
+    """
+    file_path, dataset_name, file_type, figure_path = task
+    try:
+        data = _load_plot_data(file_path, dataset_name)
+    except Exception as e:
+        return file_path, False, f"讀取失敗: {e}"
+
+    try:
+        _, ax = _worker_basemap()
+        drawn = plot_global_var(
+            dataset=data,
+            product_params=PRODUCT_CONFIGS[file_type],
+            savefig_path=figure_path,
+            ax=ax
+        )
+    except Exception as e:
+        return file_path, False, f"繪圖失敗: {e}"
+    return file_path, drawn, None
+
+
+def _iter_nc_files(directory: Path, pattern: str):
+    """以 os.scandir 列出目錄中符合 pattern 的檔案，略過 macOS 產生的 ._ 檔案"""
+    # pattern 只轉換、編譯一次，逐檔僅做 regex 比對
+    match = re.compile(fnmatch.translate(pattern)).match
+    with os.scandir(directory) as entries:
+        for entry in entries:
+            if entry.name.startswith('._') or not match(entry.name):
+                continue
+            if entry.is_file():
+                yield Path(entry.path)
+
 
 class S5Processor:
-    def __init__(self, interpolation_method='kdtree', resolution=0.01, mask_qc_value=0.75):
+    def __init__(self, interpolation_method='kdtree', resolution=0.01, mask_qc_value=0.75, max_workers=None):
         """初始化處理器
 
         Parameters:
@@ -28,10 +122,13 @@ class S5Processor:
             網格解析度（度）
         mask_qc_value : float
             QA 值的閾值
+        max_workers : int | None
+            平行處理檔案的行程數，預設為 CPU 核心數
         """
         self.interpolation_method = interpolation_method
         self.resolution = resolution
         self.mask_qc_value = mask_qc_value
+        self.max_workers = max_workers or os.cpu_count()
         self.taiwan_frame = TaiwanFrame()
 
     def create_grid(self, lon: np.ndarray, lat: np.ndarray):
@@ -55,44 +152,140 @@ class S5Processor:
             extract_range: 可選的tuple (min_lon, max_lon, min_lat, max_lat)，如果提供則提取指定範圍
         """
         # 初始處理
-        time = np.datetime64(dataset.time.values[0], 'D')
         attributes = PRODUCT_CONFIGS[self.product_type].dataset_name
 
-        # 如果提供了範圍，進行過濾
+        # 一次讀出第一個時間切片的陣列，之後的遮罩與裁切都直接在 NumPy 上進行，
+        # float32 足以表示經緯度與柱濃度，減半記憶體頻寬
+        lat = dataset.latitude.values[0].astype(np.float32, copy=False)
+        rows = slice(None)
+
         if extract_range is not None:
-            min_lon, max_lon, min_lat, max_lat = extract_range
-            mask_lon = (dataset.longitude >= min_lon) & (dataset.longitude <= max_lon)
-            mask_lat = (dataset.latitude >= min_lat) & (dataset.latitude <= max_lat)
-            dataset = dataset.where((mask_lon & mask_lat), drop=True)
+            # 以 float32 常數比較，避免與 float32 經緯度比較時被提升為 float64
+            min_lon, max_lon, min_lat, max_lat = np.asarray(extract_range, dtype=np.float32)
+
+            # 先以每條 scanline 的緯度範圍篩選，其餘變數只讀取與範圍相交的連續 scanline
+            row_hit = (np.fmax.reduce(lat, axis=1) >= min_lat) & (np.fmin.reduce(lat, axis=1) <= max_lat)
+            hit = np.flatnonzero(row_hit)
+            if hit.size == 0:
+                raise ValueError(f"No data points within region: {extract_range}")
+            rows = slice(hit[0], hit[-1] + 1)
+            lat = lat[rows]
 
-            # 檢查是否有數據
-            if dataset.sizes['scanline'] == 0 or dataset.sizes['ground_pixel'] == 0:
+        lon = dataset.longitude[0, rows].values.astype(np.float32, copy=False)
+        var = dataset[attributes][0, rows].values.astype(np.float32, copy=False)
+        mask = dataset.qa_value[0, rows].values >= self.mask_qc_value
+
+        # 如果提供了範圍，進行過濾
+        if extract_range is not None:
+            # 四個比較共用同一塊暫存陣列，就地併入 region，不為每個比較各配置一份遮罩
+            region = np.greater_equal(lon, min_lon)
+            scratch = np.empty_like(region)
+            region &= np.less_equal(lon, max_lon, out=scratch)
+            region &= np.greater_equal(lat, min_lat, out=scratch)
+            region &= np.less_equal(lat, max_lat, out=scratch)
+            if not region.any():
                 raise ValueError(f"No data points within region: {extract_range}")
 
-        # QA 過濾
-        mask_qa = (dataset.qa_value >= self.mask_qc_value)
-        dataset = dataset.where(mask_qa)
+            # 只保留涵蓋範圍的 scanline/ground_pixel 區塊
+            rows = np.flatnonzero(region.any(axis=1))
+            cols = np.flatnonzero(region.any(axis=0))
+            window = (slice(rows[0], rows[-1] + 1), slice(cols[0], cols[-1] + 1))
+            lon, lat, var = lon[window], lat[window], var[window]
+            mask = mask[window] & region[window]
 
         # 檢查數據有效性
-        if np.all(np.isnan(dataset[attributes])):
+        valid = np.isnan(var)
+        mask &= np.logical_not(valid, out=valid)
+        if not mask.any():
             raise ValueError("No valid data points after QA filtering")
 
-        lon = dataset.longitude[0].values
-        lat = dataset.latitude[0].values
-        shape = dataset.latitude[0].values.shape
-        var = dataset[attributes][0].values
+        # 遮罩外的點設為 NaN（經緯度為座標，保持完整；np.where 產生新陣列，不會改動資料集內容）
+        var = np.where(mask, var, np.float32(np.nan))
+
+        # 檔案資訊只供除錯顯示用，未開啟 DEBUG 時略過四次全陣列的 nanmin/nanmax
+        if logger.isEnabledFor(logging.DEBUG):
+            time = np.datetime64(dataset.time.values[0], 'D')
+            nc_info = getattr(self, 'nc_info', {})
+            nc_info.update({
+                'time': f"{time}",
+                'shape': f"{lat.shape}",
+                'latitude': f'{np.nanmin(lat):.2f} to {np.nanmax(lat):.2f}',
+                'longitude': f'{np.nanmin(lon):.2f} to {np.nanmax(lon):.2f}',
+            })
+            logger.debug("擷取數據資訊: %s", nc_info)
 
-        info_dict = {
-            'time': f"{time}",
-            'shape': f"{shape}",
-            'latitude': f'{np.nanmin(lat):.2f} to {np.nanmax(lat):.2f}',
-            'longitude': f'{np.nanmin(lon):.2f} to {np.nanmax(lon):.2f}',
-        }
+        return lon, lat, var
 
-        if hasattr(self, 'nc_info'):
-            self.nc_info.update(info_dict)
+    def _process_single_file(self, task):
+        """處理單一數據檔案（於子行程中執行）
 
-        return lon, lat, var
+        Returns:
+            (檔名, 錯誤訊息)，成功時錯誤訊息為 None
+        """
+        file_path, output_dir, dataset_name = task
+        try:
+            self._convert_file(file_path, output_dir, dataset_name)
+        except Exception as e:
+            return file_path.name, str(e)
+        return file_path.name, None
+
+    def _convert_file(self, file_path, output_dir, dataset_name):
+        """將原始檔 PRODUCT 群組中後續會用到的變數輸出至處理後目錄"""
+        # 輸出目錄已於每月開始時建立
+        output_path = output_dir / file_path.name
+
+        # 已轉換且不舊於原始檔時直接沿用，重跑時不必再開啟與解碼原始檔
+        # 直接 stat 輸出檔，以例外判斷不存在，省去 exists() 的另一次 stat
+        try:
+            if output_path.stat().st_mtime >= file_path.stat().st_mtime:
+                return
+        except FileNotFoundError:
+            pass
+
+        ds = xr.open_dataset(file_path, engine='netcdf4', group='PRODUCT')
+
+        try:
+            # 只保留提取與繪圖用到的變數（time 等座標隨之保留），其餘輔助變數在延遲載入下不會被讀取
+            product = ds[['latitude', 'longitude', 'qa_value', dataset_name]]
+
+            # 處理後檔案以 zlib 壓縮寫出，減少磁碟佔用與繪圖階段讀取的位元組數
+            encoding = {name: {'zlib': True, 'complevel': 4} for name in product.data_vars}
+            product.to_netcdf(output_path, encoding=encoding)
+
+            # 1. 紀錄 nc 檔訊息
+            self.nc_info = {'file_name': file_path.name}
+
+            # # 2. 提取數據和信息
+            # lon, lat, var = self.extract_data(ds, extract_range=FIGURE_BOUNDARY)
+            #
+            # # 3. 顯示檔案信息
+            # DisplayManager().display_product_info(self.nc_info)
+            #
+            # # 4. 創建網格並進行插值
+            # lon_grid, lat_grid = self.create_grid(lon, lat)
+            # var_grid = DataInterpolator.interpolate(
+            #     lon, lat, var,
+            #     lon_grid, lat_grid,
+            #     method=self.interpolation_method
+            # )
+            #
+            # # 5. 創建插值後的數據集
+            # interpolated_ds = xr.Dataset(
+            #     {
+            #         self.product_type.dataset_name: (
+            #             ['time', 'latitude', 'longitude'],
+            #             var_grid[np.newaxis, :, :]
+            #         )
+            #     },
+            #     coords={
+            #         'time': ds.time.values[0:1],
+            #         'latitude': np.squeeze(lat_grid[:, 0]),
+            #         'longitude': np.squeeze(lon_grid[0, :])
+            #     }
+            # )
+
+        finally:
+            ds.close()
 
     def process_each_data(self,
                           file_class: ClassInput,
@@ -109,123 +302,92 @@ class S5Processor:
             start_date (str): 開始日期 (YYYY-MM-DD)
             end_date (str): 結束日期 (YYYY-MM-DD)
         """
-        def process_single_file(file_path, output_dir):
-            """處理單一數據檔案"""
-            ds = xr.open_dataset(file_path, engine='netcdf4', group='PRODUCT')
-
-            # 確保輸出目錄存在
-            output_dir.mkdir(parents=True, exist_ok=True)
-            output_path = output_dir / file_path.name
-
-            if not output_path.exists():
-                ds.to_netcdf(output_path)
-
-            if ds is None:
-                return
-
-            try:
-                # 1. 紀錄 nc 檔訊息
-                self.nc_info = {'file_name': file_path.name}
-
-                # # 2. 提取數據和信息
-                # lon, lat, var = self.extract_data(ds, extract_range=FIGURE_BOUNDARY)
-                #
-                # # 3. 顯示檔案信息
-                # DisplayManager().display_product_info(self.nc_info)
-                #
-                # # 4. 創建網格並進行插值
-                # lon_grid, lat_grid = self.create_grid(lon, lat)
-                # var_grid = DataInterpolator.interpolate(
-                #     lon, lat, var,
-                #     lon_grid, lat_grid,
-                #     method=self.interpolation_method
-                # )
-                #
-                # # 5. 創建插值後的數據集
-                # interpolated_ds = xr.Dataset(
-                #     {
-                #         self.product_type.dataset_name: (
-                #             ['time', 'latitude', 'longitude'],
-                #             var_grid[np.newaxis, :, :]
-                #         )
-                #     },
-                #     coords={
-                #         'time': ds.time.values[0:1],
-                #         'latitude': np.squeeze(lat_grid[:, 0]),
-                #         'longitude': np.squeeze(lon_grid[0, :])
-                #     }
-                # )
-
-            finally:
-                ds.close()
-
         # 主處理流程
         start = datetime.strptime(start_date, '%Y-%m-%d')
         end = datetime.strptime(end_date, '%Y-%m-%d')
         current_date = start
 
-        # 按月份逐月處理
+        product_type = file_type
+        file_pattern = f"*{file_class}_L2__{file_type}*.nc"
+        dataset_name = PRODUCT_CONFIGS[file_type].dataset_name
+
+        # 1. 按月份準備目錄路徑並建立必要的目錄，各根目錄下的產品目錄只組一次，逐月只需接上年/月
+        raw_base = RAW_DATA_DIR / product_type
+        output_base = PROCESSED_DATA_DIR / product_type
+        figure_base = FIGURE_DIR / product_type
+        month_dirs = []
         while current_date <= end:
-            # 1. 準備當月的目錄路徑
-            product_type = file_type
-            year = current_date.strftime('%Y')
-            month = current_date.strftime('%m')
+            year_month = Path(current_date.strftime('%Y'), current_date.strftime('%m'))
 
-            input_dir = RAW_DATA_DIR / product_type / year / month
-            output_dir = PROCESSED_DATA_DIR / product_type / year / month
-            figure_dir = FIGURE_DIR / product_type / year / month
+            input_dir = raw_base / year_month
+            output_dir = output_base / year_month
+            figure_dir = figure_base / year_month
 
-            # 2. 創建必要的目錄
             for directory in [output_dir, figure_dir]:
                 directory.mkdir(parents=True, exist_ok=True)
 
-            file_pattern = f"*{file_class}_L2__{file_type}*.nc"
-
-            # 3. 處理原始數據（如果存在）
-            if input_dir.exists():
-                for file_path in input_dir.glob(file_pattern):
-                    # 檢查檔案日期是否在指定範圍內
-                    date_to_check = datetime.strptime(file_path.name[20:28], '%Y%m%d')
-                    if not (start <= date_to_check <= end):
-                        continue
-                    try:
-                        process_single_file(file_path, output_dir)
-                    except Exception as e:
-                        logger.error(f"處理檔案 {file_path.name} 時發生錯誤: {e}")
-                        continue
-
-            # 4. 繪製圖片（使用處理後的數據）
-            processed_files = list(output_dir.glob(file_pattern))
-            if not processed_files:
-                logger.warning(f"在 {output_dir} 中找不到符合條件的處理後檔案")
+            month_dirs.append((input_dir, output_dir, figure_dir))
+            current_date = (current_date + relativedelta(months=1)).replace(day=1)
+
+        # 2. 每個月的原始檔與處理後檔案各只列出一次；處理後檔案與原始檔同名，
+        #    繪圖的檔案為已存在的處理後檔案加上本次轉換將產生的檔案
+        convert_tasks, plot_tasks, existing = [], {}, set()
+        for input_dir, output_dir, figure_dir in month_dirs:
+            raw_files = _dated_files(input_dir, file_pattern, start, end) if input_dir.exists() else []
+            processed_files = _dated_files(output_dir, file_pattern, start, end)
+            if not raw_files and not processed_files:
+                logger.warning("在 %s 中找不到符合條件的原始或處理後檔案", input_dir)
                 continue
 
-            for file_path in processed_files:
-                date_to_check = datetime.strptime(file_path.name[20:28], '%Y%m%d')
-                if not (start <= date_to_check <= end):
-                    continue
-                figure_path = figure_dir / f"{file_path.stem}.png"
-                try:
-                    plot_global_var(
-                        dataset=file_path,
-                        product_params=PRODUCT_CONFIGS[file_type],
-                        savefig_path=figure_path,
-                        map_scale='Taiwan',
-                        show_stations=True
-                    )
-                except Exception as e:
-                    logger.error(f"繪製檔案 {file_path.name} 時發生錯誤: {e}")
-                    continue
-
-            # 4. 移至下個月
-            current_date = (current_date + relativedelta(months=1)).replace(day=1)
+            convert_tasks.extend((file_path, output_dir, dataset_name) for file_path in raw_files)
+            existing.update(processed_files)
+            for file_path in [*processed_files, *(output_dir / raw.name for raw in raw_files)]:
+                plot_tasks[file_path] = (file_path, dataset_name, file_type, figure_dir / f"{file_path.stem}.png")
+
+        # 行程數以兩階段中較多的檔案數為上限，避免少量檔案時啟動閒置的行程，沒有任何檔案時不啟動行程池
+        n_workers = min(self.max_workers, max(len(convert_tasks), len(plot_tasks)))
+        if n_workers == 0:
+            logger.warning("在 %s 至 %s 之間找不到任何原始或處理後檔案", start_date, end_date)
+            return
+
+        with multiprocessing.Pool(n_workers, initializer=_init_worker) as pool:
+            # 3. 處理原始數據，各檔案互相獨立，先完成的先回傳
+            failed = set()
+            for file_name, error in pool.imap_unordered(self._process_single_file, convert_tasks, chunksize=2):
+                if error is not None:
+                    failed.add(file_name)
+                    logger.error("處理檔案 %s 時發生錯誤: %s", file_name, error)
+
+            # 4. 繪製圖片（使用處理後的數據），略過本次轉換失敗且原本不存在的處理後檔案
+            tasks = [task for file_path, task in plot_tasks.items()
+                     if file_path in existing or file_path.name not in failed]
+
+            # 各子行程建立一次自己的底圖，讀取與繪圖都在子行程中平行進行
+            skipped = 0
+            for file_path, drawn, error in pool.imap_unordered(_plot_file, tasks):
+                if error is not None:
+                    logger.error("處理檔案 %s 時發生錯誤: %s", file_path.name, error)
+                elif not drawn:
+                    skipped += 1
+                    logger.warning("檔案 %s 在地圖範圍內的有效像素過少，未輸出圖檔", file_path.name)
+
+            if skipped:
+                logger.warning("共 %d 個檔案因有效像素過少未輸出圖檔，動畫將缺少這些日期", skipped)
 
     @staticmethod
     def _save_monthly_average(container, grid, year, month, output_file):
         """保存月平均數據"""
-        # 計算平均值
-        no2_stack = np.stack(container)
-        no2_average = np.nanmean(no2_stack, axis=0)
+        # 計算平均值：逐張累加總和與有效次數，不必堆疊成 (N, lat, lon) 陣列，container 也可以是產生器
+        total = np.zeros(grid[0].shape)
+        count = np.zeros(grid[0].shape, dtype=np.int32)
+        for data in container:
+            valid = ~np.isnan(data)
+            total += np.where(valid, data, 0)
+            count += valid
+
+        # 沒有任何有效值的格點為 0/0，與 nanmean 相同得到 NaN
+        with np.errstate(invalid='ignore'):
+            no2_average = total / count
 
         # 創建數據集
         # 確保年月格式正確
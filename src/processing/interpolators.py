@@ -8,6 +8,26 @@ import numpy as np
 class DataInterpolator:
     """數據插值器，支援多種插值方法"""
 
+    @staticmethod
+    def _valid_points(lon, lat, data):
+        """移除無效值（NaN），回傳有效點座標、數值及其 KD 樹；沒有有效點時回傳 None"""
+        # 就地合併三個 NaN 檢查，並在索引取值前先確認是否有有效點
+        valid_mask = np.isnan(data)
+        valid_mask |= np.isnan(lon)
+        valid_mask |= np.isnan(lat)
+        np.logical_not(valid_mask, out=valid_mask)
+        if not valid_mask.any():
+            return None
+
+        valid_lon = lon[valid_mask]
+        valid_lat = lat[valid_mask]
+        valid_data = data[valid_mask]
+
+        # 布林索引的結果已是一維，不需再 flatten 複製
+        points = np.column_stack((valid_lon, valid_lat))
+        # 每個檔案只建一次樹並隨即查詢，不平衡切分與不壓縮節點可縮短建樹時間
+        return points, valid_data, cKDTree(points, balanced_tree=False, compact_nodes=False)
+
     @staticmethod
     def griddata_interpolation(lon, lat, data, lon_grid, lat_grid, max_distance=0.1):
         """使用 griddata 進行插值，只填充距離較近的網格點
@@ -23,26 +43,18 @@ class DataInterpolator:
        max_distance : float
            最大插值距離（單位：度），超過此距離的網格點不進行插值
        """
-        # 移除無效值（NaN）
-        valid_mask = ~np.isnan(lon) & ~np.isnan(lat) & ~np.isnan(data)
-        valid_lon = lon[valid_mask]
-        valid_lat = lat[valid_mask]
-        valid_data = data[valid_mask]
-
-        if len(valid_data) == 0:
+        valid = DataInterpolator._valid_points(lon, lat, data)
+        if valid is None:
             return np.full_like(lon_grid, np.nan)
 
-        points = np.column_stack((valid_lon.flatten(), valid_lat.flatten()))
-        values = valid_data.flatten()
-
-        # 建立 KDTree 用於距離檢查
-        tree = cKDTree(points)
+        # KDTree 用於距離檢查
+        points, values, tree = valid
 
         # 將網格點轉換為適合 griddata 的格式
-        grid_points = np.column_stack((lon_grid.flatten(), lat_grid.flatten()))
+        grid_points = np.column_stack((lon_grid.ravel(), lat_grid.ravel()))
 
-        # 查找每個網格點最近的原始數據點的距離
-        distances, _ = tree.query(grid_points, k=1)
+        # 查找每個網格點最近的原始數據點的距離，超過 max_distance 即停止搜尋（距離為 inf），並使用所有 CPU 核心
+        distances, _ = tree.query(grid_points, k=1, distance_upper_bound=max_distance, workers=-1)
 
         # 創建遮罩，只對距離在閾值內的點進行插值
         mask = distances <= max_distance
@@ -62,34 +74,27 @@ class DataInterpolator:
     @staticmethod
     def kdtree_interpolation(lon, lat, data, lon_grid, lat_grid, max_distance=0.1):
         """使用 KDTree 進行插值，只填充距離較近的網格點"""
-        # 移除無效值（NaN）
-        valid_mask = ~np.isnan(lon) & ~np.isnan(lat) & ~np.isnan(data)
-        valid_lon = lon[valid_mask]
-        valid_lat = lat[valid_mask]
-        valid_data = data[valid_mask]
-
-        if len(valid_data) == 0:
+        valid = DataInterpolator._valid_points(lon, lat, data)
+        if valid is None:
             return np.full_like(lon_grid, np.nan)
 
-        # 建立 KD 樹
-        tree = cKDTree(np.column_stack((valid_lon.flatten(), valid_lat.flatten())))
+        _, values, tree = valid
 
         # 將網格點轉換為適合查詢的格式
-        grid_points = np.column_stack((lon_grid.flatten(), lat_grid.flatten()))
+        grid_points = np.column_stack((lon_grid.ravel(), lat_grid.ravel()))
 
-        # 使用 query 方法查找最近的點和距離
-        distances, indices = tree.query(grid_points, k=1)
+        # 使用 query 方法查找最近的點和距離，超過 max_distance 即停止搜尋（距離為 inf），並使用所有 CPU 核心
+        distances, indices = tree.query(grid_points, k=1, distance_upper_bound=max_distance, workers=-1)
 
         # 創建遮罩，只對距離在閾值內的點進行插值
         mask = distances <= max_distance
 
         # 初始化結果數組為 NaN
-        interpolated_values = np.full_like(lon_grid.flatten(), np.nan)
+        interpolated_values = np.full(lon_grid.size, np.nan, dtype=lon_grid.dtype)
 
         # 只對符合距離條件的點進行插值
         if np.any(mask):
-            valid_data_flat = valid_data.flatten()
-            interpolated_values[mask] = valid_data_flat[indices[mask]]
+            interpolated_values[mask] = values[indices[mask]]
 
         return interpolated_values.reshape(lon_grid.shape)
 
@@ -1,14 +1,42 @@
 import numpy as np
+from functools import cached_property
+
+
+def _axis(start, stop, resolution):
+    """從 start 起以固定間距 resolution 排列、涵蓋到 stop 的座標軸
+
+    點數以容許浮點誤差的 ceil 明確算出，避免 np.arange 浮點步長多或少一個點；
+    間距維持 resolution，範圍不是整數倍時最後一點會略超過 stop
+    """
+    n = int(np.ceil((stop - start) / resolution - 1e-9)) + 1
+    return start + np.arange(n) * resolution
 
 
 class TaiwanFrame:
     def __init__(self, resolution=0.01, lat_Taiwan=(20, 27), lon_Taiwan=(118, 124)):
-        self.lat = np.arange(lat_Taiwan[0], lat_Taiwan[1] + resolution, resolution)
-        self.lon = np.arange(lon_Taiwan[0], lon_Taiwan[1] + resolution, resolution)
+        self.lat = _axis(lat_Taiwan[0], lat_Taiwan[1], resolution)
+        self.lon = _axis(lon_Taiwan[0], lon_Taiwan[1], resolution)
+
+    @cached_property
+    def _grid(self):
+        lon_grid, lat_grid = np.meshgrid(self.lon, self.lat)
+        # 網格為共用的快取，設為唯讀避免被呼叫端改寫
+        lon_grid.flags.writeable = False
+        lat_grid.flags.writeable = False
+        return lon_grid, lat_grid
 
     def frame(self):
-        return np.meshgrid(self.lon, self.lat)
+        return self._grid
+
+    @cached_property
+    def shape(self):
+        return self.lat.size, self.lon.size
 
     @property
     def container(self):
-        return np.zeros(shape=(self.lat.size, self.lon.size))
\ No newline at end of file
+        return np.zeros(shape=self.shape)
+
+    @property
+    def empty_container(self):
+        """未初始化的容器，供會完整覆寫每個網格的呼叫端使用，省去歸零"""
+        return np.empty(shape=self.shape)
@@ -1,5 +1,8 @@
+import os
 import imageio
-from datetime import datetime
+from concurrent.futures import ThreadPoolExecutor
+from functools import partial
+from pathlib import Path
 import re
 from PIL import Image
 import numpy as np
@@ -7,7 +10,44 @@ from src.config.settings import FIGURE_DIR
 from src.config.catalog import TypeInput
 
 
-def animate_data(file_type: TypeInput, start_date, end_date, fps=1, resize=None, **kwargs):
+# 檔名中的日期時間，例如 20240314T031823
+_DATETIME_RE = re.compile(r'(\d{8}T\d{6})')
+
+
+def _frame_datetime(filepath):
+    """從檔名提取日期時間，YYYYMMDDhhmmss 整數的大小順序即時間順序，不必解析成 datetime"""
+    match = _DATETIME_RE.search(filepath.name)
+    return int(match.group(1).replace('T', '')) if match else -1
+
+
+def _iter_frames(directory):
+    """以 os.scandir 遞迴列出 OFFL 圖片，略過 macOS 產生的 ._ 檔案"""
+    with os.scandir(directory) as entries:
+        for entry in entries:
+            if entry.is_dir(follow_symlinks=False):
+                yield from _iter_frames(entry.path)
+            elif ('OFFL' in entry.name and entry.name.endswith('.png')
+                  and not entry.name.startswith('._') and entry.is_file()):
+                yield Path(entry.path)
+
+
+def _load_frame(filepath, resize=None):
+    """讀取單張圖片並轉為陣列，PIL 解碼與縮放時會釋放 GIL，可由執行緒平行處理"""
+    # 以 with 開啟，轉為陣列後立即關閉檔案並釋放解碼緩衝
+    with Image.open(filepath) as img:
+        if resize and tuple(resize) != img.size:
+            if resize[0] < img.width or resize[1] < img.height:
+                # JPEG 可直接以縮小的尺度解碼（PNG 等其他格式不受影響），
+                # reducing_gap 讓大幅縮小時先以整數倍縮減再做 LANCZOS
+                img.draft(img.mode, resize)
+                img = img.resize(resize, Image.Resampling.LANCZOS, reducing_gap=3.0)
+            else:
+                # 放大時 LANCZOS 與 BILINEAR 差異不明顯，改用較便宜的 BILINEAR
+                img = img.resize(resize, Image.Resampling.BILINEAR)
+        return np.asarray(img)
+
+
+def animate_data(file_type: TypeInput, start_date, end_date, fps=1, resize=None, max_workers=None, **kwargs):
     """
     將 Sentinel 衛星圖片製作成 GIF 動畫
 
@@ -21,41 +61,33 @@ def animate_data(file_type: TypeInput, start_date, end_date, fps=1, resize=None,
         每秒顯示幾張圖片
     resize : tuple
         調整圖片大小，例如 (800, 600)
+    max_workers : int
+        讀取圖片的執行緒數，預設為 CPU 核心數
     """
     image_dir = FIGURE_DIR / file_type
     output_path = FIGURE_DIR / file_type / 'sentinel_animation.gif'
 
     # 取得所有圖片檔案
-    image_files = list(image_dir.glob('**/*OFFL*.png'))
-
-    # 從檔名提取日期時間
-    def get_datetime(filepath):
-        match = re.search(r'(\d{8}T\d{6})', filepath.name)
-        return datetime.strptime(match.group(1), '%Y%m%dT%H%M%S') if match else datetime.min
+    image_files = list(_iter_frames(image_dir)) if image_dir.is_dir() else []
 
     # 依照日期時間排序
-    image_files.sort(key=get_datetime)
-
-    # 準備圖片
-    images = []
-    for filepath in image_files:
-        img = Image.open(filepath)
-        if resize:
-            img = img.resize(resize, Image.Resampling.LANCZOS)
-        images.append(np.array(img))
+    image_files.sort(key=_frame_datetime)
 
-    print(f"找到 {len(images)} 張圖片")
+    print(f"找到 {len(image_files)} 張圖片")
 
-    if not images:
+    if not image_files:
         print("沒有找到符合條件的圖片！")
         return
 
-    # 製作 GIF 動畫
+    # 製作 GIF 動畫：逐張寫入，記憶體中只保留讀取中的少數幾張圖片
     print(f"正在製作 GIF 動畫... fps={fps}")
-    imageio.mimsave(
-        output_path,
-        images,
-        fps=fps,
-        loop=0  # 0 表示無限循環
-    )
+    max_workers = max_workers or os.cpu_count()
+    load = partial(_load_frame, resize=resize)
+    with ThreadPoolExecutor(max_workers=max_workers) as executor, \
+            imageio.get_writer(output_path, mode='I', fps=fps, loop=0) as writer:  # loop=0 表示無限循環
+        # 每批最多讀取 2 * max_workers 張，map 保持排序後的順序
+        batch_size = 2 * max_workers
+        for i in range(0, len(image_files), batch_size):
+            for frame in executor.map(load, image_files[i:i + batch_size]):
+                writer.append_data(frame)
     print(f"動畫製作完成：{output_path}")
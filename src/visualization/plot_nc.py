@@ -1,14 +1,19 @@
+import io
 import logging
+from functools import lru_cache
 import geopandas as gpd
+import netCDF4
 import xarray as xr
 import matplotlib.pyplot as plt
 import cartopy.crs as ccrs
 import cartopy.feature as cfeature
+from cartopy.mpl.ticker import LongitudeFormatter, LatitudeFormatter
 import numpy as np
 from typing import Literal
 from pathlib import Path
-from shapely.geometry import Point
-from scipy.signal import convolve2d
+from shapely.geometry import box
+from scipy.ndimage import uniform_filter, maximum_filter
+from matplotlib.colors import to_rgb, to_rgba
 from matplotlib.ticker import ScalarFormatter, FixedLocator
 
 from src.config.settings import FIGURE_BOUNDARY
@@ -31,10 +36,119 @@ plt.rcParams['axes.labelweight'] = 'bold'
 
 logger = logging.getLogger(__name__)
 
+# 存檔解析度：300 dpi 已足以呈現 0.01 度網格與縣市界
+_SAVEFIG_DPI = 300
+
+# platecarree_plot 放大台灣時的經度網格線位置（Gridliner 只取刻度值，可跨圖共用）
+_TAIWAN_LON_LOCATOR = FixedLocator([119, 120, 121, 122, 123])
+
+# PNG 以低壓縮等級編碼：批次存檔時以稍大的檔案換取數倍的編碼速度
+_PNG_PIL_KWARGS = {'compress_level': 1}
+
 
 def smooth_kernel(data, kernel_size=5):
-    kernel = np.ones((kernel_size, kernel_size))
-    return convolve2d(data, kernel, mode='same', boundary='wrap') / np.sum(kernel)
+    # 盒狀濾波可分離，uniform_filter 以累加和計算，成本與 kernel 大小無關
+    nan_mask = np.isnan(data)
+    if not nan_mask.any():
+        return uniform_filter(data, size=kernel_size, mode='wrap')
+
+    # 累加和會讓 NaN 沿整列擴散，先以 0 填補，再把窗口內含 NaN 的格點設回 NaN（與卷積結果一致）
+    # 填補後的副本本身即作為輸出：濾波逐列經由緩衝區計算，可安全地原地寫回，省去一次配置
+    smoothed = np.where(nan_mask, 0, data)
+    uniform_filter(smoothed, size=kernel_size, mode='wrap', output=smoothed)
+    smoothed[maximum_filter(nan_mask, size=kernel_size, mode='wrap')] = np.nan
+    return smoothed
+
+
+@lru_cache(maxsize=1)
+def _taiwan_counties() -> gpd.GeoDataFrame:
+    """台灣縣市界（靜態資料，只讀取一次）"""
+    return gpd.read_file(Path(__file__).parents[2] / "data/shapefiles/taiwan/COUNTY_MOI_1090820.shp")
+
+
+@lru_cache(maxsize=1)
+def _station_data() -> gpd.GeoDataFrame:
+    """空氣品質監測站位置（靜態資料，只讀取一次），以站名為索引"""
+    station_data = gpd.read_file(Path(__file__).parents[2] / "data/shapefiles/stations/空氣品質監測站位置圖_121_10704.shp")
+    return station_data.set_index('SiteName', drop=False)
+
+
+@lru_cache(maxsize=None)
+def _target_stations(stations: tuple[str, ...]) -> gpd.GeoDataFrame:
+    """過濾出要標記的測站（依站名索引查詢），同一組測站只查詢一次"""
+    station_data = _station_data()
+    return station_data.loc[station_data.index.intersection(stations)]
+
+
+@lru_cache(maxsize=1)
+def _taiwan_counties_feature() -> cfeature.ShapelyFeature:
+    """台灣底圖的縣市界 cartopy feature，重複使用同一份幾何，投影後的路徑由 cartopy 快取
+
+    只保留 FIGURE_BOUNDARY（外加 0.5 度）內的部分，並以小於輸出像素的容許誤差簡化頂點，
+    省去投影與繪製範圍外的離島及看不出差異的細節
+    """
+    min_lon, max_lon, min_lat, max_lat = FIGURE_BOUNDARY
+    counties = _taiwan_counties().clip(box(min_lon - 0.5, min_lat - 0.5, max_lon + 0.5, max_lat + 0.5))
+    geometry = counties['geometry'].simplify(0.0005)
+    return cfeature.ShapelyFeature(geometry, ccrs.PlateCarree(), edgecolor='black', facecolor='none')
+
+
+def _over_white(color, alpha: float) -> tuple[float, float, float]:
+    """以 alpha 疊在白底上的不透明顏色，等同半透明圖層畫在白色背景上的結果"""
+    return tuple((1 - alpha * (1 - np.asarray(to_rgb(color)))).tolist())
+
+
+def _nan_extent(values: np.ndarray) -> tuple[float, float]:
+    """忽略 NaN 的最小值與最大值"""
+    return float(np.nanmin(values)), float(np.nanmax(values))
+
+
+def _fit_to_axes(data: xr.DataArray, ax, dpi: float, margin: float = 1.0) -> xr.DataArray:
+    """裁切並降採樣數據，只保留繪圖時看得到、解析得出的部分
+
+    支援軌道數據（二維 longitude/latitude）與規則網格（一維 longitude/latitude 座標，如月平均檔）：
+    1. 只保留與地圖範圍（外加 margin 度）相交的 scanline/ground_pixel 或 latitude/longitude 區塊
+    2. 若剩餘格點仍多於輸出像素的兩倍，以區塊平均降採樣，多出的格點在圖上無法分辨
+    """
+    min_lon, max_lon, min_lat, max_lat = ax.get_extent(crs=ccrs.PlateCarree())
+    lon, lat = data.longitude.values, data.latitude.values
+    lon_inside = (lon >= min_lon - margin) & (lon <= max_lon + margin)
+    lat_inside = (lat >= min_lat - margin) & (lat <= max_lat + margin)
+
+    if lon.ndim == 1:
+        # 規則網格：經緯度各自對應一個維度，分別沿該維度裁切
+        row_dim, col_dim = data.latitude.dims[0], data.longitude.dims[0]
+        rows, cols = np.flatnonzero(lat_inside), np.flatnonzero(lon_inside)
+    else:
+        row_dim, col_dim = data.dims
+        inside = lon_inside & lat_inside
+        rows, cols = np.flatnonzero(inside.any(axis=1)), np.flatnonzero(inside.any(axis=0))
+    if rows.size == 0 or cols.size == 0:
+        return data
+
+    data = data.isel({row_dim: slice(rows[0], rows[-1] + 1), col_dim: slice(cols[0], cols[-1] + 1)})
+
+    # 軸在輸出圖檔中的像素大小
+    width_px = ax.bbox.width / ax.figure.dpi * dpi
+    height_px = ax.bbox.height / ax.figure.dpi * dpi
+    stride = int(min(data.sizes[row_dim] // (2 * height_px), data.sizes[col_dim] // (2 * width_px)))
+    if stride > 1:
+        data = data.coarsen({row_dim: stride, col_dim: stride}, boundary='trim').mean()
+    return data
+
+
+def _valid_fraction(data: xr.DataArray, ax) -> float:
+    """地圖範圍內有效（非 NaN）像素所佔的比例，範圍內沒有任何像素時為 0
+
+    經緯度為一維（規則網格）或二維（軌道）座標皆可，xarray 依維度名稱廣播
+    """
+    min_lon, max_lon, min_lat, max_lat = ax.get_extent(crs=ccrs.PlateCarree())
+    inside = ((data.longitude >= min_lon) & (data.longitude <= max_lon) &
+              (data.latitude >= min_lat) & (data.latitude <= max_lat))
+    n_inside = int(inside.sum())
+    if n_inside == 0:
+        return 0.0
+    return int((data.notnull() & inside).sum()) / n_inside
 
 
 def plot_stations(ax, stations: list[str], label_offset: tuple[float, float] = (-0.2, 0)):
@@ -45,15 +159,10 @@ def plot_stations(ax, stations: list[str], label_offset: tuple[float, float] = (
         stations: 要標記的測站名稱列表
         label_offset: (x偏移, y偏移)，用於調整標籤位置
     """
-    # 讀取測站資料
-    station_data = gpd.read_file(
-        Path(__file__).parents[2] / "data/shapefiles/stations/空氣品質監測站位置圖_121_10704.shp"
-    )
-    # 創建測站的 GeoDataFrame
-    station_geometry = [Point(xy) for xy in zip(station_data['TWD97Lon'], station_data['TWD97Lat'])]
-
     # all station
-    # geodata = gpd.GeoDataFrame(station_data, crs=ccrs.PlateCarree(), geometry=station_geometry)
+    # station_data = _station_data()
+    # geodata = gpd.GeoDataFrame(station_data, crs=ccrs.PlateCarree(),
+    #                            geometry=gpd.points_from_xy(station_data['TWD97Lon'], station_data['TWD97Lat']))
     # geodata.plot(ax=ax, color='gray', markersize=10)
 
     # matplotlib 預設顏色和標記循環
@@ -61,25 +170,31 @@ def plot_stations(ax, stations: list[str], label_offset: tuple[float, float] = (
     markers = ['o', 's', '^', 'v', 'D', '<', '>', 'p', '*']  # 標記循環
 
     # 過濾出要標記的測站
-    target_stations = station_data[station_data['SiteName'].isin(stations)]
+    target_stations = _target_stations(tuple(stations))
 
     legend_labels = []
     legend_handles = []
 
-    for i, (_, row) in enumerate(target_stations.iterrows()):
+    # 直接取出欄位陣列，避免 iterrows 逐列建立 Series；每站標記不同，仍需各自 scatter
+    lons = target_stations['TWD97Lon'].to_numpy()
+    lats = target_stations['TWD97Lat'].to_numpy()
+    names = target_stations['SiteEngNam'].to_numpy()
+
+    for i, (lon, lat, name) in enumerate(zip(lons, lats, names)):
         # 循環使用顏色和標記
         color = colors[i % len(colors)]
         marker = markers[i % len(markers)]
 
         # 畫點並保存標記物件
-        marker_obj = ax.scatter(row['TWD97Lon'], row['TWD97Lat'],
+        marker_obj = ax.scatter(lon, lat,
                                 marker=marker,
                                 color=color,
                                 s=15,
                                 transform=ccrs.PlateCarree(),
-                                label=row['SiteEngNam'])
+                                zorder=3,  # 底圖先建立，測站須高於之後加入的數據圖層
+                                label=name)
 
-        legend_labels.append(row['SiteEngNam'])
+        legend_labels.append(name)
         legend_handles.append(marker_obj)
 
     # 添加圖例
@@ -90,6 +205,60 @@ def plot_stations(ax, stations: list[str], label_offset: tuple[float, float] = (
               borderaxespad=0.)
 
 
+def create_basemap(map_scale: Literal['global', 'Taiwan'] = 'global',
+                   show_stations: bool = False,
+                   mark_stations: list = ['古亭', '楠梓', '鳳山'],
+                   ):
+    """建立可重複使用的底圖（範圍、縣市邊界、地圖特徵、測站與網格線）
+
+    批次繪圖時只需建立一次，之後將 ax 傳入 plot_global_var 僅更新數據圖層
+
+    Returns:
+        (fig, ax)
+    """
+    # 創建圖形和投影
+    fig = plt.figure(figsize=(12, 8) if map_scale == 'global' else (8, 8))
+    ax = plt.axes(projection=ccrs.PlateCarree())
+
+    # 設定全球範圍
+    if map_scale == 'global':
+        ax.set_global()
+    else:
+        ax.set_extent(FIGURE_BOUNDARY, crs=ccrs.PlateCarree())
+
+    # 如果是台灣範圍且需要顯示測站
+    if map_scale == 'Taiwan':
+        # ax.add_feature(cfeature.COASTLINE.with_scale('10m'))
+
+        # 添加縣市邊界
+        ax.add_feature(_taiwan_counties_feature())
+
+    if show_stations and mark_stations:
+        plot_stations(ax, mark_stations)
+
+    else:
+        # 添加地圖特徵：全球圖使用 50m 即足夠；海洋改以底色呈現，不需投影與繪製海洋多邊形
+        scale = '50m' if map_scale == 'global' else '10m'
+        ax.set_facecolor(to_rgba(cfeature.COLORS['water'], alpha=0.1))
+        ax.add_feature(cfeature.BORDERS.with_scale(scale), linestyle=':')
+        ax.add_feature(cfeature.COASTLINE.with_scale(scale))
+        # 陸地以不透明、預先與白底混色的顏色繪製，外觀與白底上 10% 的 LAND 相同，不會再疊上海洋底色
+        ax.add_feature(cfeature.LAND.with_scale(scale), facecolor=_over_white(cfeature.COLORS['land'], 0.1))
+
+    # 設定網格線：刻度標籤改用固定刻度與經緯度格式，Gridliner 僅畫線不推算標籤
+    if map_scale == 'global':
+        xticks, yticks = np.arange(-180, 181, 60), np.arange(-90, 91, 30)
+    else:
+        xticks, yticks = [119, 120, 121, 122, 123], [21, 22, 23, 24, 25, 26]  # 設定經緯度刻度
+    ax.set_xticks(xticks, crs=ccrs.PlateCarree())
+    ax.set_yticks(yticks, crs=ccrs.PlateCarree())
+    ax.xaxis.set_major_formatter(LongitudeFormatter())
+    ax.yaxis.set_major_formatter(LatitudeFormatter())
+    ax.gridlines(xlocs=xticks, ylocs=yticks, linestyle='--', alpha=0.7)
+
+    return fig, ax
+
+
 def plot_global_var(dataset: Path | str,
                     product_params,
                     show_info: bool = True,
@@ -97,50 +266,79 @@ def plot_global_var(dataset: Path | str,
                     map_scale: Literal['global', 'Taiwan'] = 'global',
                     show_stations: bool = False,
                     mark_stations: list = ['古亭', '楠梓', '鳳山'],
+                    ax=None,
+                    dpi: float = _SAVEFIG_DPI,
+                    min_valid_fraction: float = 0.01,
+                    interactive: bool = False,
                     ):
     """
     在全球地圖上繪製 var 分布圖
+
+    若提供 ax（由 create_basemap 建立），則沿用該底圖，map_scale 與測站參數不再作用；
+    存檔後會移除本次的數據圖層，讓同一底圖可供下一個檔案使用。
+    interactive 為 True 時以 plt.show() 顯示並保留圖；否則（批次存檔）自行建立的圖在結束後即關閉。
+    dpi 為存檔解析度，數據也只保留到此解析度分辨得出的密度
+    地圖範圍內的有效像素比例低於 min_valid_fraction 的場景（例如幾乎全被雲遮蔽）不繪製也不存檔
+
+    Returns:
+        bool: 是否已繪製（略過的場景為 False，供批次流程回報）
     """
+    reuse_basemap = ax is not None
+    drawn = False
+    data_layers = []  # 本次繪製的數據圖層，沿用底圖時於結束後移除
+    ds = None
+    fig = None
+    opened_here = isinstance(dataset, (str, Path))
+
     try:
         # 判斷輸入類型並適當處理
-        from netCDF4 import Dataset
-        if isinstance(dataset, (str, Path)):
-            if 'PRODUCT' in Dataset(dataset, 'r').groups:
-                ds = xr.open_dataset(dataset, engine='netcdf4', group='PRODUCT')
-            else:
-                ds = xr.open_dataset(dataset, engine='netcdf4')
+        if opened_here:
+            # 只開啟一次檔案：用同一個 handle 判斷是否有 PRODUCT 群組並交給 xarray，關閉 ds 時一併關閉
+            nc = netCDF4.Dataset(dataset, 'r')
+            group = 'PRODUCT' if 'PRODUCT' in nc.groups else None
+            ds = xr.open_dataset(xr.backends.NetCDF4DataStore(nc, group=group), cache=False)
+            ds.encoding['source'] = str(dataset)
         elif isinstance(dataset, xr.Dataset):
             ds = dataset
         else:
             raise NotImplementedError
 
+        # 只讀取要繪製的變數與其經緯度的第一個時間，其餘變數不載入
+        data = ds[product_params.dataset_name].isel(time=0).load()
+
+        # 經緯度範圍只計算一次，供資訊顯示與範圍矩形共用
+        lat = data.latitude.values
+        lon_min, lon_max = _nan_extent(data.longitude.values)
+        lat_min, lat_max = _nan_extent(lat)
+
         if show_info:
-            lon = ds.longitude[0].values
-            lat = ds.latitude[0].values
-            var = ds[product_params.dataset_name][0].values
-
-            nc_info = {'file_name': dataset.name if isinstance(dataset, Path) else '',
-                       'time': np.datetime64(ds.time.values[0], 'D'),
-                       'shape': ds.latitude[0].values.shape,
-                       'latitude': f'{np.nanmin(lat):.2f} to {np.nanmax(lat):.2f}',
-                       'longitude': f'{np.nanmin(lon):.2f} to {np.nanmax(lon):.2f}',
+            nc_info = {'file_name': Path(ds.encoding.get('source', '')).name,
+                       'time': np.datetime64(data.time.values, 'D'),
+                       'shape': lat.shape,
+                       'latitude': f'{lat_min:.2f} to {lat_max:.2f}',
+                       'longitude': f'{lon_min:.2f} to {lon_max:.2f}',
                        }
 
             DisplayManager().display_product_info(nc_info)
 
-        # 創建圖形和投影
-        fig = plt.figure(figsize=(12, 8) if map_scale == 'global' else (8, 8))
-        ax = plt.axes(projection=ccrs.PlateCarree())
-
-        # 設定全球範圍
-        if map_scale == 'global':
-            ax.set_global()
+        # 建立或沿用底圖
+        if reuse_basemap:
+            fig = ax.figure
         else:
-            ax.set_extent(FIGURE_BOUNDARY, crs=ccrs.PlateCarree())
+            fig, ax = create_basemap(map_scale, show_stations, mark_stations)
 
-        # 繪製數據
-        dataset = ds[product_params.dataset_name][0]
-        dataset.data = smooth_kernel(dataset.data, kernel_size=3)
+        # 繪製數據，只處理地圖範圍內的部分
+        dataset = _fit_to_axes(data, ax, dpi=dpi)
+
+        # 地圖範圍內幾乎沒有有效像素時，省去平滑、繪製與存檔
+        valid_fraction = _valid_fraction(dataset, ax)
+        if valid_fraction < min_valid_fraction:
+            logger.info("地圖範圍內有效像素比例 %.2f%% 過低，略過繪圖: %s",
+                        valid_fraction * 100, Path(ds.encoding.get('source', '')).name)
+            return drawn
+
+        # 繪圖不需要 float64 精度，以 float32 平滑可減半記憶體頻寬
+        dataset.data = smooth_kernel(dataset.data.astype(np.float32, copy=False), kernel_size=3)
 
         # 方法1：使用 ScalarFormatter
         formatter = ScalarFormatter(useMathText=True)
@@ -153,6 +351,8 @@ def plot_global_var(dataset: Path | str,
             cmap='RdBu_r',
             transform=ccrs.PlateCarree(),
             robust=True,  # 自動處理極端值
+            add_labels=False,  # 刻度已由底圖提供，不加 x/y 軸標籤
+            rasterized=True,  # 存成向量格式時只有數據圖層點陣化，底圖與文字仍為向量
             vmin=product_params.vmin,
             vmax=product_params.vmax,
             cbar_kwargs={
@@ -165,37 +365,11 @@ def plot_global_var(dataset: Path | str,
                 'extend': 'neither',
             }
         )
+        data_layers.extend([im.colorbar, im])
 
         # plot = dataset.plot.pcolormesh(ax=ax, x='longitude', y='latitude', add_colorbar=False, cmap='jet')
 
-        # 如果是台灣範圍且需要顯示測站
-        if map_scale == 'Taiwan':
-            # ax.add_feature(cfeature.COASTLINE.with_scale('10m'))
-
-            # 讀取縣市和測站資料並添加縣市邊界
-            taiwan_counties = gpd.read_file(Path(__file__).parents[2] / "data/shapefiles/taiwan/COUNTY_MOI_1090820.shp")
-            ax.add_geometries(taiwan_counties['geometry'], crs=ccrs.PlateCarree(), edgecolor='black', facecolor='none')
-
-        if show_stations and mark_stations:
-            plot_stations(ax, mark_stations)
-
-
-        else:
-            # 添加地圖特徵
-            ax.add_feature(cfeature.BORDERS.with_scale('10m'), linestyle=':')
-            ax.add_feature(cfeature.COASTLINE.with_scale('10m'))
-            ax.add_feature(cfeature.LAND.with_scale('10m'), alpha=0.1)
-            ax.add_feature(cfeature.OCEAN.with_scale('10m'), alpha=0.1)
-
-        # 設定網格線
-        gl = ax.gridlines(draw_labels=True, linestyle='--', alpha=0.7)
-        gl.top_labels = False
-        gl.right_labels = False
-        gl.xlocator = FixedLocator([119, 120, 121, 122, 123])  # 設定經度刻度
-
         # 用矩形標記數據範圍
-        lon_min, lon_max = float(np.nanmin(ds.longitude)), float(np.nanmax(ds.longitude))
-        lat_min, lat_max = float(np.nanmin(ds.latitude)), float(np.nanmax(ds.latitude))
         rect = plt.Rectangle(
             (lon_min, lat_min),
             lon_max - lon_min,
@@ -206,23 +380,45 @@ def plot_global_var(dataset: Path | str,
             linewidth=2
         )
         ax.add_patch(rect)
+        data_layers.append(rect)
 
         # 設定標題
         time_str = np.datetime64(dataset.time.values, 'D').astype(str)
-        plt.title(f'{product_params.title} {time_str}', pad=20, fontdict={'weight': 'bold', 'fontsize': 24})
+        ax.set_title(f'{product_params.title} {time_str}', pad=20, fontdict={'weight': 'bold', 'fontsize': 24})
 
-        plt.tight_layout()
-        plt.show()
+        fig.tight_layout()
+        if interactive:
+            plt.show()
 
         if savefig_path is not None:
-            fig.savefig(savefig_path, dpi=600)
+            # 先在記憶體中完成編碼，再一次寫入檔案
+            savefig_path = Path(savefig_path)
+            buffer = io.BytesIO()
+            fmt = savefig_path.suffix.lstrip('.').lower() or None
+            save_kwargs = {'pil_kwargs': _PNG_PIL_KWARGS} if fmt == 'png' else {}
+            fig.savefig(buffer, format=fmt, dpi=dpi, **save_kwargs)
+            savefig_path.write_bytes(buffer.getvalue())
 
-        ds.close()
+        drawn = True
+        return drawn
 
     except Exception as e:
-        logger.error(f"繪圖時發生錯誤: {str(e)}")
+        logger.error("繪圖時發生錯誤: %s", e)
         raise
 
+    finally:
+        # 確保自行開啟的檔案在發生錯誤時也會關閉
+        if ds is not None and opened_here:
+            ds.close()
+
+        # 移除本次的數據圖層，保留底圖給下一個檔案
+        if reuse_basemap:
+            for layer in data_layers:
+                layer.remove()
+        # 自行建立且不需顯示（或未繪製）的圖不再需要，關閉以釋放 figure 與 cartopy 轉換
+        elif fig is not None and (not interactive or not drawn):
+            plt.close(fig)
+
 
 def platecarree_plot(dataset, product_params, zoom=True, path=None, **kwargs):
     fig, ax = plt.subplots(figsize=(7, 6), subplot_kw={'projection': ccrs.PlateCarree()})
@@ -231,7 +427,7 @@ def platecarree_plot(dataset, product_params, zoom=True, path=None, **kwargs):
         # 添加經緯度網格線和標籤
         ax.set_extent([119, 123, 21, 26], crs=ccrs.PlateCarree())
         gl = ax.gridlines(crs=ccrs.PlateCarree(), draw_labels=True, linewidth=1, color='gray', alpha=0.5)
-        gl.xlocator = plt.FixedLocator([119, 120, 121, 122, 123])
+        gl.xlocator = _TAIWAN_LON_LOCATOR
         gl.top_labels = gl.right_labels = False
     else:
         ax.set_global()
@@ -240,16 +436,13 @@ def platecarree_plot(dataset, product_params, zoom=True, path=None, **kwargs):
 
     var = product_params.dataset_name
 
-    plot = dataset[var][0].plot.pcolormesh(ax=ax, x='longitude', y='latitude', add_colorbar=False, cmap='jet', vmin=0,
-                                           vmax=1.4e-4)
+    # 只繪製地圖範圍內、以存檔解析度分辨得出的格點
+    data = _fit_to_axes(dataset[var][0], ax, dpi=fig.dpi)
+    plot = data.plot.pcolormesh(ax=ax, x='longitude', y='latitude', add_colorbar=False, cmap='jet', vmin=0,
+                                vmax=1.4e-4)
     cbar = plt.colorbar(plot, ax=ax, shrink=1, pad=0.05)
     cbar.set_label(r'$\bf NO_{2}\ mole/m^2$')
 
-    # 设置colorbar刻度标签格式为科学记数法
-    formatter = ScalarFormatter(useMathText=True)
-    formatter.set_scientific(True)
-    formatter.set_powerlimits((-2, 2))  # 可以調整使用科學記號的範圍
-
     plt.title(kwargs.get('title'))
     if path is not None:
         fig.savefig(path)
@@ -278,7 +471,6 @@ if __name__ == "__main__":
     file_ungroup = '/Users/chanchihyu/Sentinel-5P/processed/NO2___/2024/01/S5P_OFFL_L2__NO2____20240110T045402_20240110T063532_32345_03_020600_20240111T211523.nc'
     ds = xr.open_dataset(file_ungroup)
 
-    from netCDF4 import Dataset
-    nc = Dataset(file_ungroup, 'r').groups
+    nc = netCDF4.Dataset(file_ungroup, 'r').groups
 
     # plot_global_var(file)